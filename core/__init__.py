@@ -0,0 +1,28 @@
+"""Core modules of the GitHub pull request review agent."""
+
+import importlib
+
+# PEP 562 lazy re-exports: `import core` stays cheap, and heavy dependency
+# stacks (requests, yaml, smtplib) are only compiled when the symbol that
+# needs them is first touched.
+_EXPORTS = {
+    "LLMWrapper": "core.llm_wrapper",
+    "authenticate_github": "core.github_auth",
+    "load_config": "core.config_validator",
+    "load_validated_config": "core.config_validator",
+    "validate_config": "core.config_validator",
+    "ConfigValidationError": "core.config_validator",
+    "generate_review_prompt": "core.prompt_generator",
+    "analyze_diff": "core.diff_analyzer",
+    "analyze_diff_parallel": "core.diff_analyzer",
+    "send_email_notification": "core.email_notifier",
+    "setup_logger": "core.logger",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
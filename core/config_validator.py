@@ -1,37 +1,161 @@
-import yaml
+import copy
 import os
-from logger import setup_logger
+import functools
+import hashlib
+import pickle
+from core.logger import setup_logger
 
 class ConfigValidationError(Exception):
     """Custom exception for configuration validation errors."""
     pass
 
+# JSON-schema mirror of the manual checks in validate_config. When
+# fastjsonschema is available it is compiled once at import into
+# straight-line generated code, which validates the whole nested shape in
+# one pass instead of dozens of per-field isinstance/key checks per call.
+_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": ["directives", "exclusions", "llm_parameters", "llm_backends", "update_frequency"],
+    "properties": {
+        "directives": {"type": "array"},
+        "exclusions": {"type": "array"},
+        "llm_parameters": {
+            "type": "object",
+            "required": ["temperature", "max_tokens", "model_name"],
+        },
+        "llm_backends": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["backend_name", "token", "url"],
+            },
+        },
+        "update_frequency": {"type": "string"},
+    },
+}
+
+try:
+    import fastjsonschema
+    _validate_schema = fastjsonschema.compile(_CONFIG_SCHEMA)
+except ImportError:
+    fastjsonschema = None
+    _validate_schema = None
+
 # Initialize logger
 logger = setup_logger()
 
+def _parse_yaml(data, file_path):
+    """Parse raw YAML bytes, translating parse errors to ConfigValidationError."""
+    # Imported lazily so paths that hit the pickle sidecar (or never load
+    # config at all) skip compiling the whole yaml package at startup.
+    import yaml
+    # Prefer the LibYAML C loader when compiled in; it parses 5-10x faster
+    # than the pure-Python SafeLoader while accepting the same safe subset.
+    try:
+        from yaml import CSafeLoader as loader
+    except ImportError:
+        from yaml import SafeLoader as loader
+    try:
+        return yaml.load(data, Loader=loader)
+    except yaml.YAMLError as e:
+        logger.error(f"Error parsing YAML file: {e}")
+        raise ConfigValidationError(f"Error parsing YAML file: {e}")
+
+@functools.lru_cache(maxsize=64)
+def _load_cached(file_path, mtime_ns, digest):
+    """
+    Parse a config file, keyed by path, mtime, and content digest.
+
+    A pickle sidecar (`<file_path>.cache.pkl`) keyed by the same digest lets
+    fresh processes skip the YAML parse entirely when the file is unchanged.
+    """
+    sidecar = file_path + ".cache.pkl"
+    try:
+        with open(sidecar, 'rb') as cache_file:
+            cached_digest, config = pickle.load(cache_file)
+        if cached_digest == digest:
+            return config
+    except (OSError, pickle.PickleError, ValueError, EOFError):
+        pass
+
+    with open(file_path, 'rb') as file:
+        config = _parse_yaml(file.read(), file_path)
+
+    try:
+        with open(sidecar, 'wb') as cache_file:
+            pickle.dump((digest, config), cache_file)
+    except OSError:
+        # The sidecar is a best-effort optimization; a read-only config
+        # directory should not break config loading.
+        pass
+
+    return config
+
+def _stat_digest(file_path):
+    """Return the file's (mtime_ns, content digest) cache key parts."""
+    st = os.stat(file_path)
+    with open(file_path, 'rb') as file:
+        digest = hashlib.blake2b(file.read(), digest_size=16).digest()
+    return st.st_mtime_ns, digest
+
 def load_config(file_path):
-    """Load the YAML configuration file."""
+    """Load the YAML configuration file, caching parses by content hash."""
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Configuration file not found: {file_path}")
-    
+
     logger.info(f"Loading configuration file: {file_path}")
-    
-    with open(file_path, 'r') as file:
-        try:
-            config = yaml.safe_load(file)
-        except yaml.YAMLError as e:
-            logger.error(f"Error parsing YAML file: {e}")
-            raise ConfigValidationError(f"Error parsing YAML file: {e}")
-    
+
+    mtime_ns, digest = _stat_digest(file_path)
+    config = _load_cached(file_path, mtime_ns, digest)
+
     logger.info("Configuration file loaded successfully.")
-    return config
+    # Deep-copy per call: the lru_cache holds one shared dict, and handing
+    # it out directly would let any caller's mutation leak into every
+    # later load of the same file.
+    return copy.deepcopy(config)
+
+# Digests of configs that already passed validation in this process, so a
+# repeat load of an unchanged file skips revalidation as well as reparsing.
+_VALIDATED_DIGESTS = set()
+
+def load_validated_config(file_path):
+    """
+    Load and validate a configuration file in one call.
+
+    Unchanged files hit the parse caches in load_config, and their
+    validation verdict is remembered by content digest — a repeat
+    invocation on the same config costs two stat-level syscalls and a
+    hash, with no YAML parse and no schema walk.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Configuration file not found: {file_path}")
+
+    mtime_ns, digest = _stat_digest(file_path)
+    config = _load_cached(file_path, mtime_ns, digest)
+    if digest not in _VALIDATED_DIGESTS:
+        validate_config(config)
+        _VALIDATED_DIGESTS.add(digest)
+    # Same aliasing guard as load_config: callers get their own copy of
+    # the cached parse, never the shared dict.
+    return copy.deepcopy(config)
 
 def validate_config(config):
     """Validate the structure and required fields of the configuration."""
     required_fields = ["directives", "exclusions", "llm_parameters", "llm_backends", "update_frequency"]
     
     logger.info("Validating configuration structure and required fields.")
-    
+
+    if _validate_schema is not None:
+        try:
+            _validate_schema(config)
+        except fastjsonschema.JsonSchemaException as e:
+            logger.error(f"Configuration validation failed: {e}")
+            raise ConfigValidationError(str(e))
+        logger.info("Configuration validation completed successfully.")
+        return
+
+    # Fallback: manual field-by-field checks when fastjsonschema is not
+    # installed. Keep these in sync with _CONFIG_SCHEMA above.
     for field in required_fields:
         if field not in config:
             logger.error(f"Missing required field: {field}")
@@ -1,35 +1,121 @@
-def analyze_diff(diff_text):
-    """
-    Parse and analyze pull request diffs to identify code segments requiring comments or suggestions.
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 
-    Args:
-        diff_text (str): The diff text of the pull request.
+# Hunk-header pattern, matched in bytes only for lines already known to
+# start with '@'. It captures the new-file start line.
+_HUNK_HEADER = re.compile(rb"@@ -\d+(?:,\d+)? \+(\d+)")
 
-    Returns:
-        list: A list of dictionaries, each containing a code segment and its line number.
-              Example: [{"line_number": 42, "code_segment": "def example_function():"}, ...]
+def _scan(lines):
+    """
+    Core diff scan over an iterable of byte lines.
+
+    Each line is dispatched on its first byte — a single one-byte compare
+    instead of a chain of startswith string comparisons — and only added
+    lines pay the UTF-8 decode; context lines (the majority of any diff)
+    stay as undecoded bytes.
     """
     segments = []
     current_file = None
     line_number = 0
 
-    for line in diff_text.splitlines():
-        if line.startswith("diff --git"):
-            # Start of a new file
-            current_file = line.split(" ")[-1]
-            line_number = 0
-        elif line.startswith("@@"):
-            # Extract the line number from the diff hunk header
-            hunk_header = line.split(" ")[1]
-            line_number = int(hunk_header.split(",")[0].replace("+", ""))
-        elif line.startswith("+") and not line.startswith("+++"):
+    for line in lines:
+        c = line[:1]
+        if c == b"+":
+            if line.startswith(b"+++"):
+                # File header; counts as a regular line like other preamble.
+                line_number += 1
+                continue
             # Identify added lines in the diff
             code_segment = line[1:].strip()
             if code_segment:  # Ignore empty lines
-                segments.append({"line_number": line_number, "code_segment": code_segment})
+                segments.append({
+                    "line_number": line_number,
+                    "code_segment": code_segment.decode("utf-8", "replace"),
+                })
             line_number += 1
-        elif not line.startswith("-"):
+        elif c == b"-":
+            # Removed lines don't advance the new-file line counter.
+            pass
+        elif c == b"@":
+            match = _HUNK_HEADER.match(line)
+            if match:
+                # Pick up the new-file line number from the diff hunk header
+                line_number = int(match.group(1))
+            else:
+                line_number += 1
+        elif c == b"d" and line.startswith(b"diff --git"):
+            # Start of a new file
+            current_file = line.rsplit(b" ", 1)[-1].decode("utf-8", "replace")
+            line_number = 0
+        else:
             # Increment line number for unchanged lines
             line_number += 1
 
     return segments
+
+def analyze_diff(diff_lines):
+    """
+    Parse and analyze pull request diffs to identify code segments requiring comments or suggestions.
+
+    Args:
+        diff_lines (str or iterable): The diff of the pull request, either as
+            a single string or as any iterator of lines (e.g. a streamed HTTP
+            response), so huge diffs never need to be held in memory at once.
+
+    Returns:
+        list: A list of dictionaries, each containing a code segment and its line number.
+              Example: [{"line_number": 42, "code_segment": "def example_function():"}, ...]
+    """
+    if isinstance(diff_lines, str):
+        # One encode of the whole buffer, then byte-level line splitting.
+        lines = diff_lines.encode("utf-8", "surrogatepass").split(b"\n")
+    else:
+        lines = (line.encode("utf-8", "surrogatepass") if isinstance(line, str) else line
+                 for line in diff_lines)
+    return _scan(lines)
+
+# Start-of-line file boundary in a unified diff.
+_FILE_BOUNDARY = re.compile(rb"^diff --git ", re.MULTILINE)
+
+# Below this many per-file chunks the fork/pickle overhead of a process
+# pool outweighs the parallel scan.
+_MIN_PARALLEL_CHUNKS = 4
+
+def split_diff_chunks(diff_text):
+    """
+    Split a whole-PR diff into one chunk per file on `diff --git` boundaries.
+
+    Any preamble before the first boundary becomes its own chunk so no
+    input bytes are dropped.
+    """
+    if isinstance(diff_text, str):
+        diff_text = diff_text.encode("utf-8", "surrogatepass")
+    starts = [m.start() for m in _FILE_BOUNDARY.finditer(diff_text)]
+    if not starts:
+        return [diff_text] if diff_text else []
+    if starts[0] != 0:
+        starts.insert(0, 0)
+    return [diff_text[begin:end]
+            for begin, end in zip(starts, starts[1:] + [len(diff_text)])]
+
+def _analyze_chunk(chunk):
+    """Scan one per-file chunk; runs in a worker process."""
+    return _scan(chunk.split(b"\n"))
+
+def analyze_diff_parallel(diff_text):
+    """
+    Analyze a diff across a process pool, one task per changed file.
+
+    The scan resets its line counter at every `diff --git` boundary, so
+    per-file chunks are independent and their results can simply be
+    concatenated in order. Small diffs fall through to the serial path —
+    below _MIN_PARALLEL_CHUNKS files the pool costs more than it saves.
+    """
+    chunks = split_diff_chunks(diff_text)
+    if len(chunks) <= _MIN_PARALLEL_CHUNKS:
+        return analyze_diff(diff_text)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        return list(itertools.chain.from_iterable(
+            executor.map(_analyze_chunk, chunks)))
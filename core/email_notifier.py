@@ -1,11 +1,59 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from logger import setup_logger
+import threading
+from core.logger import setup_logger
+
+# smtplib and the email.mime classes are imported lazily inside the
+# functions below: reviewer runs that never send a notification skip
+# compiling the whole SMTP/MIME stack at startup.
 
 # Initialize logger
 logger = setup_logger()
 
+# Cached SMTP sessions keyed by (server, port, sender). Opening a connection
+# costs a TCP+STARTTLS handshake plus authentication per notification, which
+# dwarfs the actual message send; reuse the session instead.
+_SMTP_POOL = {}
+_SMTP_POOL_LOCK = threading.Lock()
+
+def _get_smtp(smtp_server, smtp_port, sender_email, sender_password):
+    """
+    Return a connected, authenticated SMTP session from the pool, creating
+    one if needed. Stale sessions are detected with a NOOP probe and evicted.
+    """
+    import smtplib
+
+    key = (smtp_server, smtp_port, sender_email)
+    with _SMTP_POOL_LOCK:
+        server = _SMTP_POOL.get(key)
+        if server is not None:
+            try:
+                status, _ = server.noop()
+                if status == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            _SMTP_POOL.pop(key, None)
+            try:
+                server.close()
+            except Exception:
+                pass
+
+        logger.info(f"Connecting to SMTP server: {smtp_server}:{smtp_port}")
+        server = smtplib.SMTP(smtp_server, smtp_port)
+        server.starttls()
+        server.login(sender_email, sender_password)
+        _SMTP_POOL[key] = server
+        return server
+
+def _evict_smtp(smtp_server, smtp_port, sender_email):
+    """Drop a pooled SMTP session, e.g. after the server disconnected."""
+    with _SMTP_POOL_LOCK:
+        server = _SMTP_POOL.pop((smtp_server, smtp_port, sender_email), None)
+    if server is not None:
+        try:
+            server.close()
+        except Exception:
+            pass
+
 def send_email_notification(recipient_email, subject, message, smtp_server="smtp.gmail.com", smtp_port=587, sender_email=None, sender_password=None):
     """
     Send an email notification for critical issues.
@@ -26,6 +74,10 @@ def send_email_notification(recipient_email, subject, message, smtp_server="smtp
     if not all([recipient_email, subject, message, sender_email, sender_password]):
         raise ValueError("Recipient email, subject, message, sender email, and sender password are required.")
 
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     try:
         # Create the email
         msg = MIMEMultipart()
@@ -34,13 +86,17 @@ def send_email_notification(recipient_email, subject, message, smtp_server="smtp
         msg["Subject"] = subject
         msg.attach(MIMEText(message, "plain"))
 
-        # Connect to the SMTP server and send the email
-        logger.info(f"Connecting to SMTP server: {smtp_server}:{smtp_port}")
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
+        # Send over a pooled SMTP session; reconnect once if the server
+        # dropped the connection since the last notification.
+        server = _get_smtp(smtp_server, smtp_port, sender_email, sender_password)
+        try:
+            server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            logger.info("SMTP session went stale; reconnecting.")
+            _evict_smtp(smtp_server, smtp_port, sender_email)
+            server = _get_smtp(smtp_server, smtp_port, sender_email, sender_password)
             server.send_message(msg)
-            logger.info(f"Email sent successfully to {recipient_email}")
+        logger.info(f"Email sent successfully to {recipient_email}")
 
     except Exception as e:
         logger.error(f"Failed to send email: {e}")
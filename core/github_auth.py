@@ -1,4 +1,16 @@
+import hashlib
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Authenticated sessions from successful probes, keyed by a token hash (the
+# token itself is never kept as a dict key). The GET /user probe costs an API
+# call and a round-trip per invocation; within the TTL the cached session is
+# returned instead.
+_AUTH_CACHE = {}
+_AUTH_TTL_SECONDS = 300
 
 def authenticate_github(token):
     """
@@ -15,16 +27,34 @@ def authenticate_github(token):
     """
     if not token:
         raise ValueError("GitHub token is required for authentication.")
-    
+
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = _AUTH_CACHE.get(key)
+    if cached is not None:
+        timestamp, session = cached
+        if time.monotonic() - timestamp < _AUTH_TTL_SECONDS:
+            return session
+        del _AUTH_CACHE[key]
+
     session = requests.Session()
+    # Keep-alive connection pool: the reviewer issues many requests against
+    # api.github.com and the per-request TLS handshake dominates otherwise.
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                          max_retries=Retry(total=0))
+    session.mount("https://", adapter)
     session.headers.update({
         "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
+        "Accept": "application/vnd.github.v3+json",
+        # requests negotiates compression by default, but pin gzip explicitly
+        # so large diff/file-list payloads stay compressed on the wire even
+        # if a default header is ever stripped or overridden.
+        "Accept-Encoding": "gzip",
     })
     
     # Test the authentication by making a simple API request
     response = session.get("https://api.github.com/user")
     if response.status_code != 200:
         raise ValueError("Failed to authenticate with GitHub. Check your token.")
-    
+
+    _AUTH_CACHE[key] = (time.monotonic(), session)
     return session
@@ -1,9 +1,196 @@
+import re
+
+import orjson
 import requests
-from logger import setup_logger
+from concurrent.futures import ThreadPoolExecutor
+from core.logger import setup_logger
 
 # Initialize logger
 logger = setup_logger()
 
+def _json_body(response):
+    """Parse a response body with orjson, which consumes the raw bytes
+    directly and is several times faster than requests' stdlib json."""
+    return orjson.loads(response.content)
+
+_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Media type that makes GET /pulls/{n} return the unified diff directly —
+# one streamed text response instead of per-file JSON to reconstruct.
+_DIFF_MEDIA_TYPE = "application/vnd.github.v3.diff"
+
+# One query returning everything the reviewer needs about a PR: replaces the
+# separate REST round-trips for details, changed files, and the head commit.
+_PR_BUNDLE_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      title
+      author { login }
+      headRefOid
+      files(first: 100, after: $cursor) {
+        nodes { path }
+        pageInfo { hasNextPage endCursor }
+      }
+    }
+  }
+}
+"""
+
+# Extracts the last page number from a GitHub `Link` response header.
+_LAST_PAGE = re.compile(r'[?&]page=(\d+)>; rel="last"')
+
+# Comment-list schema, compiled once with fastjsonschema when installed so a
+# 200-comment review is validated in one generated-code pass instead of
+# ~7 Python-level dict/isinstance operations per comment.
+_COMMENTS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "required": ["file_path", "start_line_number", "end_line_number", "content"],
+        "properties": {
+            "file_path": {"type": "string"},
+            "start_line_number": {"type": "integer"},
+            "end_line_number": {"type": "integer"},
+            "content": {"type": "string"},
+        },
+    },
+}
+
+try:
+    import fastjsonschema
+    _validate_comments = fastjsonschema.compile(_COMMENTS_SCHEMA)
+except ImportError:
+    fastjsonschema = None
+    _validate_comments = None
+
+_REQUIRED_COMMENT_KEYS = frozenset({"file_path", "start_line_number", "end_line_number", "content"})
+
+def _fetch_changed_files(session, files_url):
+    """
+    Fetch every page of a PR's changed files.
+
+    GitHub paginates /pulls/{n}/files (30 per page by default), so a single
+    GET silently drops files on large PRs. Request 100 per page, read the
+    total page count from the first response's Link header, and fetch the
+    remaining pages concurrently.
+    """
+    response = session.get(files_url, params={"per_page": 100})
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch changed files: {_json_body(response).get('message', 'Unknown error')}")
+    pages = [_json_body(response)]
+
+    match = _LAST_PAGE.search(response.headers.get("Link", ""))
+    if match:
+        last_page = int(match.group(1))
+
+        def fetch_page(page):
+            page_response = session.get(files_url, params={"per_page": 100, "page": page})
+            if page_response.status_code != 200:
+                raise Exception(f"Failed to fetch changed files page {page}: "
+                                f"{_json_body(page_response).get('message', 'Unknown error')}")
+            return _json_body(page_response)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            pages.extend(executor.map(fetch_page, range(2, last_page + 1)))
+
+    return [file["filename"] for page in pages for file in page]
+
+def conditional_get(session, url):
+    """
+    GET a URL using a per-session ETag cache and If-None-Match.
+
+    GitHub does not count 304 responses against the primary rate limit, so
+    repeated polls of an unchanged resource become free requests.
+
+    Args:
+        session (requests.Session): An authenticated session object.
+        url (str): The URL to fetch.
+
+    Returns:
+        tuple: `(status_code, json_body)`. A 304 answered from the cache is
+               reported as a 200 with the previously cached body.
+    """
+    cache = getattr(session, "_etag_cache", None)
+    if cache is None:
+        cache = session._etag_cache = {}
+
+    headers = {}
+    cached = cache.get(url)
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+
+    response = session.get(url, headers=headers)
+    if response.status_code == 304 and cached is not None:
+        return 200, cached[1]
+
+    try:
+        body = _json_body(response)
+    except ValueError:
+        body = {}
+    if response.status_code == 200:
+        etag = response.headers.get("ETag")
+        if etag:
+            cache[url] = (etag, body)
+    return response.status_code, body
+
+def fetch_pr_bundle(session, repo_name, pr_number):
+    """
+    Fetch pull request title, author, head commit, and changed files in a
+    single GraphQL request, cached on the session.
+
+    Args:
+        session (requests.Session): An authenticated session object.
+        repo_name (str): The repository name in the format 'owner/repo'.
+        pr_number (int): The pull request number.
+
+    Returns:
+        dict: A dictionary with `title`, `author`, `head_sha`, and
+              `changed_files` keys.
+
+    Raises:
+        Exception: If the GraphQL request fails.
+    """
+    cache = getattr(session, "_pr_cache", None)
+    if cache is None:
+        cache = session._pr_cache = {}
+    key = (repo_name, pr_number)
+    if key in cache:
+        return cache[key]
+
+    owner, _, name = repo_name.partition("/")
+    changed_files = []
+    cursor = None
+    pr_data = None
+    while True:
+        response = session.post(_GRAPHQL_URL, json={
+            "query": _PR_BUNDLE_QUERY,
+            "variables": {"owner": owner, "name": name, "number": pr_number, "cursor": cursor},
+        })
+        if response.status_code != 200:
+            raise Exception(f"GraphQL PR query failed with status {response.status_code}")
+        data = _json_body(response)
+        if data.get("errors"):
+            raise Exception(f"GraphQL PR query failed: {data['errors'][0].get('message', 'Unknown error')}")
+        pr_data = data["data"]["repository"]["pullRequest"]
+        files = pr_data["files"] or {"nodes": [], "pageInfo": {"hasNextPage": False}}
+        changed_files.extend(node["path"] for node in files["nodes"])
+        if not files["pageInfo"]["hasNextPage"]:
+            break
+        cursor = files["pageInfo"]["endCursor"]
+
+    author = (pr_data.get("author") or {}).get("login", "Unknown")
+    bundle = {
+        "title": pr_data.get("title", "No title provided"),
+        "author": author,
+        "head_sha": pr_data["headRefOid"],
+        "changed_files": changed_files,
+    }
+    cache[key] = bundle
+    logger.info(f"Fetched PR #{pr_number} bundle via GraphQL: Author={author}, "
+                f"{len(changed_files)} changed files")
+    return bundle
+
 def fetch_pull_request_details(session, repo_name, pr_number):
     """
     Fetch pull request details using the GitHub API.
@@ -22,29 +209,36 @@ def fetch_pull_request_details(session, repo_name, pr_number):
     """
     if not repo_name or not isinstance(pr_number, int):
         raise ValueError("Invalid repository name or pull request number.")
-    
+
     logger.info(f"Fetching details for PR #{pr_number} in repository '{repo_name}'")
-    
+
+    # One GraphQL round-trip (cached on the session) covers details, files,
+    # and head commit; fall back to the REST endpoints if it fails.
+    try:
+        bundle = fetch_pr_bundle(session, repo_name, pr_number)
+    except Exception as e:
+        logger.warning(f"GraphQL PR fetch failed, falling back to REST: {e}")
+    else:
+        return {
+            "author": bundle["author"],
+            "title": bundle["title"],
+            "changed_files": bundle["changed_files"],
+        }
+
     # Fetch pull request details
     pr_url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}"
-    pr_response = session.get(pr_url)
-    if pr_response.status_code != 200:
-        logger.error(f"Failed to fetch PR details: {pr_response.json().get('message', 'Unknown error')}")
-        raise Exception(f"Failed to fetch pull request details: {pr_response.json().get('message', 'Unknown error')}")
-    
-    pr_data = pr_response.json()
+    status, pr_data = conditional_get(session, pr_url)
+    if status != 200:
+        logger.error(f"Failed to fetch PR details: {pr_data.get('message', 'Unknown error')}")
+        raise Exception(f"Failed to fetch pull request details: {pr_data.get('message', 'Unknown error')}")
+
     author = pr_data.get("user", {}).get("login", "Unknown")
     title = pr_data.get("title", "No title provided")
-    
+
     logger.info(f"Successfully fetched PR details: Author={author}, Title={title}")
-    
-    # Fetch list of changed files
-    files_url = f"{pr_url}/files"
-    files_response = session.get(files_url)
-    if files_response.status_code != 200:
-        raise Exception(f"Failed to fetch changed files: {files_response.json().get('message', 'Unknown error')}")
-    
-    changed_files = [file["filename"] for file in files_response.json()]
+
+    # Fetch the full, paginated list of changed files
+    changed_files = _fetch_changed_files(session, f"{pr_url}/files")
     
     logger.info(f"Fetched {len(changed_files)} changed files for PR #{pr_number}")
     
@@ -64,7 +258,9 @@ def fetch_pull_request_diff(session, repo_name, pr_number):
         pr_number (int): The pull request number.
 
     Returns:
-        str: The diff of the pull request as a string.
+        iterator: The diff of the pull request as an iterator of lines,
+                  suitable for feeding directly into `analyze_diff`. Callers
+                  that need the full text can join the lines themselves.
 
     Raises:
         ValueError: If the repository name or pull request number is invalid.
@@ -72,21 +268,22 @@ def fetch_pull_request_diff(session, repo_name, pr_number):
     """
     if not repo_name or not isinstance(pr_number, int):
         raise ValueError("Invalid repository name or pull request number.")
-    
+
     logger.info(f"Fetching diff for PR #{pr_number} in repository '{repo_name}'")
-    
-    # Fetch the pull request diff
+
+    # Stream the pull request diff so large PRs never have to be
+    # materialized twice (once as the response body, once split into lines).
     diff_url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}"
-    headers = {"Accept": "application/vnd.github.v3.diff"}
-    diff_response = session.get(diff_url, headers=headers)
-    
+    headers = {"Accept": _DIFF_MEDIA_TYPE}
+    diff_response = session.get(diff_url, headers=headers, stream=True)
+
     if diff_response.status_code != 200:
-        logger.error(f"Failed to fetch PR diff: {diff_response.json().get('message', 'Unknown error')}")
-        raise Exception(f"Failed to fetch pull request diff: {diff_response.json().get('message', 'Unknown error')}")
-    
+        logger.error(f"Failed to fetch PR diff: {_json_body(diff_response).get('message', 'Unknown error')}")
+        raise Exception(f"Failed to fetch pull request diff: {_json_body(diff_response).get('message', 'Unknown error')}")
+
     logger.info(f"Successfully fetched diff for PR #{pr_number}")
-    
-    return diff_response.text
+
+    return diff_response.iter_lines(decode_unicode=True, chunk_size=65536)
 
 def fetch_latest_commit_id(session, repo_name, pr_number):
     """
@@ -106,15 +303,21 @@ def fetch_latest_commit_id(session, repo_name, pr_number):
     """
     if not repo_name or not isinstance(pr_number, int):
         raise ValueError("Invalid repository name or pull request number.")
-    
+
+    # Reuse the cached GraphQL bundle when available instead of another
+    # round-trip to /pulls/{n}.
+    try:
+        return fetch_pr_bundle(session, repo_name, pr_number)["head_sha"]
+    except Exception as e:
+        logger.warning(f"GraphQL PR fetch failed, falling back to REST: {e}")
+
     # Fetch pull request details
     pr_url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}"
-    pr_response = session.get(pr_url)
-    if pr_response.status_code != 200:
-        logger.error(f"Failed to fetch PR details: {pr_response.json().get('message', 'Unknown error')}")
-        raise Exception(f"Failed to fetch pull request details: {pr_response.json().get('message', 'Unknown error')}")
-    
-    pr_data = pr_response.json()
+    status, pr_data = conditional_get(session, pr_url)
+    if status != 200:
+        logger.error(f"Failed to fetch PR details: {pr_data.get('message', 'Unknown error')}")
+        raise Exception(f"Failed to fetch pull request details: {pr_data.get('message', 'Unknown error')}")
+
     latest_commit_id = pr_data.get("head", {}).get("sha", None)
     if not latest_commit_id:
         logger.error("Failed to retrieve the latest commit ID.")
@@ -132,15 +335,23 @@ def validate_comments_structure(comments):
     Raises:
         ValueError: If the comments structure is invalid.
     """
+    if _validate_comments is not None:
+        try:
+            _validate_comments(comments)
+        except fastjsonschema.JsonSchemaException as e:
+            raise ValueError(str(e))
+        return
+
+    # Fallback: manual per-comment checks when fastjsonschema is not
+    # installed. Keep these in sync with _COMMENTS_SCHEMA above.
     if not isinstance(comments, list):
         raise ValueError("Comments should be a list.")
 
     for comment in comments:
         if not isinstance(comment, dict):
             raise ValueError("Each comment should be a dictionary.")
-        required_keys = {"file_path", "start_line_number", "end_line_number", "content"}
-        if not required_keys.issubset(comment.keys()):
-            raise ValueError(f"Each comment must contain the keys: {required_keys}")
+        if not _REQUIRED_COMMENT_KEYS.issubset(comment.keys()):
+            raise ValueError(f"Each comment must contain the keys: {set(_REQUIRED_COMMENT_KEYS)}")
         if not isinstance(comment["file_path"], str):
             raise ValueError("The 'file_path' must be a string.")
         if not isinstance(comment["start_line_number"], int) or not isinstance(comment["end_line_number"], int):
@@ -150,7 +361,11 @@ def validate_comments_structure(comments):
 
 def post_inline_comments(session, repo_name, pr_number, comments):
     """
-    Post inline comments on a pull request.
+    Post inline comments on a pull request as a single review.
+
+    All comments are submitted atomically through one POST to
+    /pulls/{n}/reviews instead of one request per comment — a 50-comment
+    review costs one round-trip and one rate-limit point instead of 50.
 
     Args:
         session: Authenticated GitHub session.
@@ -163,22 +378,35 @@ def post_inline_comments(session, repo_name, pr_number, comments):
     try:
         validate_comments_structure(comments)
         latest_commit_id = fetch_latest_commit_id(session, repo_name, pr_number)
+        url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}/reviews"
+
+        review_comments = []
         for comment in comments:
-            url = f"https://api.github.com/repos/{repo_name}/pulls/{pr_number}/comments"
-            payload = {
-                "commit_id": latest_commit_id,  # The commit ID to which the comment is attached
+            review_comment = {
                 "path": comment["file_path"],
-                "start_line": int(comment["start_line_number"]),  # GitHub API uses 'line' for single-line comments
                 "line": int(comment["end_line_number"]),  # GitHub API uses 'line' for inline comments
                 "side": "RIGHT",  # Assuming comments are for the right side of the diff
-                "start_side": "RIGHT",  # Assuming comments are for the right side of the diff
                 "body": comment["content"]
             }
-            response = session.post(url, json=payload)
-            if response.status_code != 201:
-                logger.error(f"Failed to post comment: {response.json().get('message', 'Unknown error')}")
-            else:
-                logger.info(f"Comment posted successfully on {comment['file_path']} at line {comment['start_line_number']}.")
+            start_line = int(comment["start_line_number"])
+            # The reviews API rejects start_line == line; only send the
+            # range fields for true multi-line comments.
+            if start_line != review_comment["line"]:
+                review_comment["start_line"] = start_line
+                review_comment["start_side"] = "RIGHT"
+            review_comments.append(review_comment)
+
+        payload = {
+            "commit_id": latest_commit_id,  # The commit ID to which the review is attached
+            "event": "COMMENT",
+            "comments": review_comments
+        }
+        response = session.post(url, json=payload)
+        if response.status_code not in (200, 201):
+            message = _json_body(response).get('message', 'Unknown error')
+            logger.error(f"Failed to post review with {len(review_comments)} comments: {message}")
+            raise Exception(f"Failed to post review: {message}")
+        logger.info(f"Posted review with {len(review_comments)} inline comments on PR #{pr_number}.")
     except Exception as e:
         logger.error(f"An error occurred while posting comments: {e}")
         raise e
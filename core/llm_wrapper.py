@@ -1,12 +1,21 @@
+import collections
+import hashlib
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import orjson
 import requests
-import time
-from logger import setup_logger
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from core.logger import setup_logger
 
 # Initialize logger
 logger = setup_logger()
 
 class LLMWrapper:
-    def __init__(self, backends, retry_attempts=3, retry_delay=2):
+    def __init__(self, backends, retry_attempts=None, retry_delay=None, cache_size=128,
+                 hedge_delay=None, session=None):
         """
         Initialize the LLM wrapper.
 
@@ -16,12 +25,61 @@ class LLMWrapper:
                 - `token`: API token for the backend.
                 - `model_name`: Model name to use.
                 - `url`: API endpoint URL (optional, default depends on backend).
-            retry_attempts (int): Number of retry attempts for failed requests.
-            retry_delay (int): Delay (in seconds) between retries.
+            retry_attempts (int): Deprecated; retries now live in the HTTP
+                transport. Still honored as the Retry total when passed.
+            retry_delay (int): Deprecated; still honored as the transport's
+                exponential backoff factor when passed. Retry-After headers
+                from 429/503 responses are respected automatically.
+            cache_size (int): Maximum number of responses kept in the
+                prompt-keyed LRU cache.
+            hedge_delay (float): When set, the next backend is launched after
+                this many seconds if the previous one has not answered yet
+                (hedged requests), and the first successful response wins.
+                When None (default), backends are tried strictly in order.
+            session (requests.Session): An existing pooled session to reuse
+                (e.g. the authenticated GitHub session), avoiding a second
+                connection pool in the process. A private session is created
+                when omitted.
         """
+        if retry_attempts is not None or retry_delay is not None:
+            warnings.warn(
+                "retry_attempts/retry_delay are deprecated; retries are "
+                "handled by the HTTP transport (with exponential backoff, "
+                "jitter via Retry-After, and POST retries built in).",
+                DeprecationWarning, stacklevel=2)
         self.backends = backends
-        self.retry_attempts = retry_attempts
-        self.retry_delay = retry_delay
+        self.retry_attempts = 3 if retry_attempts is None else retry_attempts
+        self.retry_delay = 2 if retry_delay is None else retry_delay
+        self.hedge_delay = hedge_delay
+
+        # A pooled session with transport-level retries: connections to the
+        # LLM endpoints are kept alive across queries, and retry/backoff for
+        # transient failures happens inside urllib3 instead of a Python-level
+        # sleep loop. allowed_methods=None lets POSTs be retried too, and
+        # Retry-After headers on 429/503 are honored by urllib3 by default.
+        retry = Retry(total=self.retry_attempts, backoff_factor=self.retry_delay,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=None)
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+        if session is not None:
+            # Shared session: mount the retry adapter only on the backend URL
+            # prefixes (requests matches the longest mounted prefix), so the
+            # session's other traffic keeps its own adapter and policy.
+            self._session = session
+            for backend in backends:
+                if backend.get("url"):
+                    self._session.mount(backend["url"], adapter)
+        else:
+            self._session = requests.Session()
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+        # LRU of responses keyed by a content hash of (prompt, parameters).
+        # The LLM round-trip dwarfs everything else in the pipeline, so
+        # re-reviews with an identical prompt should be a dict lookup.
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
 
     def _make_request(self, backend, payload):
         """
@@ -42,33 +100,43 @@ class LLMWrapper:
             "Content-Type": "application/json"
         }
         url = backend.get("url")
-        
-        for attempt in range(1, self.retry_attempts + 1):
-            try:
-                logger.info(f"Attempting request to {backend['backend_name']} (Attempt {attempt})")
-                response = requests.post(url, json=payload, headers=headers, timeout=10)
-                if response.status_code == 200:
-                    logger.info(f"Request to {backend['backend_name']} succeeded.")
-                    return response.json()
-                else:
-                    logger.warning(f"Request to {backend['backend_name']} failed with status {response.status_code}: {response.text}")
-            except requests.RequestException as e:
-                logger.error(f"Request to {backend['backend_name']} failed: {e}")
-            
-            if attempt < self.retry_attempts:
-                time.sleep(self.retry_delay)
-        
+
+        # Retries and backoff are handled by the session's urllib3 Retry, so
+        # a single call here already covers self.retry_attempts attempts.
+        try:
+            logger.info(f"Sending request to {backend['backend_name']}")
+            # Encode the body with orjson (and decode below) — noticeably
+            # faster than the stdlib encoder for multi-MB LLM responses.
+            response = self._session.post(url, data=orjson.dumps(payload),
+                                          headers=headers, timeout=10)
+            if response.status_code == 200:
+                logger.info(f"Request to {backend['backend_name']} succeeded.")
+                return orjson.loads(response.content)
+            logger.warning(f"Request to {backend['backend_name']} failed with status {response.status_code}: {response.text}")
+        except requests.RequestException as e:
+            logger.error(f"Request to {backend['backend_name']} failed: {e}")
+
         raise Exception(f"All attempts to {backend['backend_name']} failed.")
 
-    def query(self, prompt, max_tokens=100, temperature=0.7, top_p=1.0):
+    def query(self, prompt, max_tokens=100, temperature=0.7, top_p=1.0, cache=None,
+              response_schema=None):
         """
         Query the LLM backends.
 
         Args:
-            prompt (str): The input prompt for the LLM.
+            prompt (str or list): The input prompt for the LLM — either flat
+                text or a list of content blocks (e.g. carrying
+                `cache_control` markers), passed through to the backend
+                payload unchanged.
             max_tokens (int): Maximum number of tokens to generate.
             temperature (float): Sampling temperature.
             top_p (float): Nucleus sampling parameter.
+            cache (bool): Force response caching on or off. By default
+                responses are cached only for deterministic queries
+                (temperature == 0), since sampled outputs differ per call.
+            response_schema (dict): Optional JSON schema the output must
+                match. Backends supporting structured outputs then return
+                guaranteed-parseable JSON instead of best-effort text.
 
         Returns:
             dict: Response from the first successful backend.
@@ -76,22 +144,171 @@ class LLMWrapper:
         Raises:
             Exception: If all backends fail.
         """
+        use_cache = cache if cache is not None else temperature == 0
+        key = None
+        if use_cache:
+            key = hashlib.blake2b(
+                f"{prompt}|{max_tokens}|{temperature}|{top_p}|{response_schema}".encode(),
+                digest_size=16).digest()
+            with self._cache_lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    logger.info("LLM response served from cache.")
+                    return self._cache[key]
+
         payload = {
             "input": prompt,
             "max_tokens": max_tokens,
             "temperature": temperature,
             "top_p": top_p
         }
+        if response_schema is not None:
+            # OpenAI-style structured outputs; backends that don't support
+            # the field ignore it and the caller's text-parse fallback applies.
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": response_schema}
+            }
+
+        if self.hedge_delay is not None and len(self.backends) > 1:
+            response = self._query_hedged(payload)
+        else:
+            response = self._query_sequential(payload)
+
+        if key is not None:
+            with self._cache_lock:
+                self._cache[key] = response
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return response
+
+    def stream(self, prompt, max_tokens=100, temperature=0.7, top_p=1.0):
+        """
+        Stream a completion, yielding decoded text deltas as they arrive
+        instead of blocking until the last token. For large max_tokens the
+        time-to-last-token dominates a blocking query; consumers of this
+        generator can start work on early output while the rest generates.
+
+        Args:
+            prompt (str): The input prompt for the LLM.
+            max_tokens (int): Maximum number of tokens to generate.
+            temperature (float): Sampling temperature.
+            top_p (float): Nucleus sampling parameter.
+
+        Yields:
+            str: Text fragments in generation order, from the first backend
+                 that accepts the request.
+
+        Raises:
+            Exception: If all backends fail before streaming starts.
+        """
+        payload = {
+            "input": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": True
+        }
 
+        for backend in self.backends:
+            headers = {
+                "Authorization": f"Bearer {backend['token']}",
+                "Content-Type": "application/json"
+            }
+            try:
+                logger.info(f"Streaming from backend: {backend['backend_name']}")
+                response = self._session.post(
+                    backend.get("url"),
+                    data=orjson.dumps(self._backend_payload(backend, payload)),
+                    headers=headers, timeout=10, stream=True)
+            except requests.RequestException as e:
+                logger.error(f"Request to {backend['backend_name']} failed: {e}")
+                continue
+            if response.status_code != 200:
+                logger.warning(f"Request to {backend['backend_name']} failed "
+                               f"with status {response.status_code}: {response.text}")
+                continue
+            yield from self._iter_stream(response)
+            return
+
+        raise Exception("All backends failed to process the request.")
+
+    @staticmethod
+    def _iter_stream(response):
+        """Decode server-sent events from a streaming completion response."""
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                event = orjson.loads(data)
+            except orjson.JSONDecodeError:
+                logger.warning(f"Skipping undecodable stream event: {data[:200]}")
+                continue
+            choices = event.get("choices") or [{}]
+            # OpenAI-compatible backends put deltas under either
+            # choices[0].text (completions) or choices[0].delta.content (chat).
+            delta = choices[0].get("text") or (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+    def _query_sequential(self, payload):
+        """Try each backend in order, returning the first successful response."""
         for backend in self.backends:
             try:
                 logger.info(f"Querying backend: {backend['backend_name']}")
-                # Set the model name in the payload if specified
-                if "model_name" in backend:
-                    payload["model"] = backend["model_name"]
-                return self._make_request(backend, payload)
+                return self._make_request(backend, self._backend_payload(backend, payload))
             except Exception as e:
                 logger.error(f"Backend {backend['backend_name']} failed: {e}")
                 logger.info("Switching to the next backend.")
 
         raise Exception("All backends failed to process the request.")
+
+    def _query_hedged(self, payload):
+        """
+        Query the backends with hedging: each subsequent backend is launched
+        hedge_delay seconds after the previous one if no response has
+        arrived yet, and the first successful response wins. This avoids
+        waiting out the primary backend's full retry cycle before the
+        fallback is even attempted.
+        """
+        executor = ThreadPoolExecutor(max_workers=len(self.backends))
+        try:
+            pending = set()
+            backend_for = {}
+            launched = 0
+            while pending or launched < len(self.backends):
+                if launched < len(self.backends):
+                    backend = self.backends[launched]
+                    logger.info(f"Querying backend: {backend['backend_name']}")
+                    future = executor.submit(
+                        self._make_request, backend, self._backend_payload(backend, payload))
+                    backend_for[future] = backend
+                    pending.add(future)
+                    launched += 1
+                    timeout = self.hedge_delay if launched < len(self.backends) else None
+                else:
+                    timeout = None
+
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    backend = backend_for[future]
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        logger.error(f"Backend {backend['backend_name']} failed: {e}")
+
+            raise Exception("All backends failed to process the request.")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _backend_payload(backend, payload):
+        """Copy the payload with the backend's model name applied, if any."""
+        payload = dict(payload)
+        # Set the model name in the payload if specified
+        if "model_name" in backend:
+            payload["model"] = backend["model_name"]
+        return payload
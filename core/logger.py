@@ -1,23 +1,38 @@
 import logging
 import os
 
+# Tracks whether the log directory has already been created, so repeated
+# setup_logger calls skip the makedirs syscall.
+_DIR_CREATED = False
+
 def setup_logger(log_file="logs/github_reviewer.log"):
     """
     Set up the logging system.
 
+    Safe to call from every module: the handler is attached once and
+    subsequent calls return the already-configured logger.
+
     Args:
         log_file (str): Path to the log file.
 
     Returns:
         logging.Logger: Configured logger instance.
     """
-    # Ensure the logs directory exists
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    global _DIR_CREATED
 
     # Configure the logger
     logger = logging.getLogger("GitHubReviewer")
+    if logger.handlers:
+        # Already configured by an earlier import; avoid attaching a
+        # duplicate handler (which would amplify every log line's I/O).
+        return logger
     logger.setLevel(logging.DEBUG)
 
+    # Ensure the logs directory exists
+    if not _DIR_CREATED:
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        _DIR_CREATED = True
+
     # File handler
     file_handler = logging.FileHandler(log_file)
     file_handler.setLevel(logging.DEBUG)
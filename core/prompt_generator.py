@@ -1,12 +1,100 @@
+import functools
 import os
+import stat
+
+@functools.lru_cache(maxsize=256)
+def _read_directive(path, mtime_ns):
+    # mtime_ns is part of the key purely to invalidate the cache when the
+    # file changes; an os.stat is ~1us versus a multi-ms read on each call.
+    with open(path, 'r') as file:
+        return file.read().strip()
 
 def load_directive_content(directive):
-    if os.path.isfile(directive):
-        with open(directive, 'r') as file:
-            directive = file.read().strip()
+    try:
+        st = os.stat(directive)
+    except OSError:
+        return directive
+    if stat.S_ISREG(st.st_mode):
+        return _read_directive(directive, st.st_mtime_ns)
     return directive
 
-def generate_review_prompt(repository_context, diff_details, directives):
+def _compact_diff(diff_details, context=3):
+    """
+    Reduce a unified diff to the parts the LLM actually needs: changed lines
+    plus `context` surrounding lines, along with the file (`+++`) and hunk
+    (`@@`) headers. Preamble lines (diff --git, index, mode changes) and
+    binary patches are dropped — they only spend prompt tokens.
+
+    Args:
+        diff_details (str): The full unified diff text.
+        context (int): Number of unchanged lines kept around each change.
+
+    Returns:
+        str: The compacted diff.
+    """
+    lines = diff_details.splitlines()
+    keep = [False] * len(lines)
+    for i, line in enumerate(lines):
+        if line.startswith("+++ ") or line.startswith("@@"):
+            keep[i] = True
+        elif ((line.startswith("+") and not line.startswith("+++"))
+                or (line.startswith("-") and not line.startswith("---"))):
+            for j in range(max(i - context, 0), min(i + context + 1, len(lines))):
+                keep[j] = True
+
+    compacted = []
+    for i, line in enumerate(lines):
+        if not keep[i]:
+            continue
+        if line.startswith(("diff --git", "index ", "--- ", "Binary files",
+                            "GIT binary patch", "new file mode", "deleted file mode",
+                            "old mode", "new mode", "similarity index",
+                            "rename from", "rename to")):
+            continue
+        compacted.append(line)
+    return "\n".join(compacted)
+
+# Constant prompt sections, built once at import. Keeping them free of the
+# literal indentation the old triple-quoted f-string carried saves tokens on
+# every query, and joining the parts in one pass avoids rebuilding (and
+# copying) the large prompt string.
+_PROMPT_PREFIX = (
+    "You are an AI code reviewer with expertise in data engineering, architecture, "
+    "query optimization, modeling, and security. Your task is to review the "
+    "following pull request based on the provided repository context, diff details, "
+    "and coding standards. Provide detailed feedback, including suggestions for "
+    "improvement, potential bugs, and adherence to coding standards.\n\n"
+    "### Repository Context\n"
+)
+
+_PROMPT_SUFFIX = (
+    "\n\n### Instructions\n"
+    "1. Identify performance issues, potential bugs, and inconsistencies.\n"
+    "2. Suggest improvements to code quality and adherence to coding standards.\n"
+    "3. Provide specific code suggestions where applicable.\n"
+    "4. Focus on SQL query optimization if relevant.\n\n"
+    "The output MUST be in this json format where each comment is an element of the array:\n"
+    "{\n"
+    "    comments: [\n"
+    "        {\n"
+    "            file_path: ,\n"
+    "            start_line_number: 1,\n"
+    "            end_line_number: 10,\n"
+    "            content: Comment content,\n"
+    "        }\n"
+    "    ]\n"
+    "}\n"
+    "Where each comment is directed at a portion of the diff identified by the "
+    "start_line_number and end_line_number. Calculate the appropriate "
+    "start_line_number and end_line_number to highlight only the part of the diff "
+    "that is relevant to the comment.\n"
+    "IMPORTANT: make sure that the start_line_number and end_line_number values "
+    "must be part of the same hunk as the line\n\n"
+    "IMPORTANT: DO NOT include any other text, only the json format.\n\n"
+    "Begin your review below:\n"
+)
+
+def generate_review_prompt(repository_context, diff_details, directives, as_blocks=False):
     """
     Generate a formatted prompt for the LLM to review a pull request.
 
@@ -14,49 +102,36 @@ def generate_review_prompt(repository_context, diff_details, directives):
         repository_context (str): Contextual information about the repository (e.g., key files, architecture).
         diff_details (str): The diff details of the pull request.
         directives (list): A list of coding standards and guidelines.
+        as_blocks (bool): When True, return content blocks with the stable
+            prefix (instructions, repository context, directives) marked
+            `cache_control: ephemeral`, so backends with prompt caching can
+            reuse its KV across PRs and only re-encode the diff suffix.
 
     Returns:
-        str: A formatted prompt string for the LLM.
+        str or list: A flat prompt string, or a list of content-block dicts
+        when `as_blocks` is set.
     """
     # Format the directives into a readable string
-    formatted_directives = "\n\n".join(f"{load_directive_content(directive)}" for directive in directives)
-
-    # Construct the prompt
-    prompt = "\n".join([f"""
-        You are an AI code reviewer with expertise in data engineering, architecture, query optimization, modeling, and security. 
-        Your task is to review the following pull request based on the provided repository context, diff details, 
-        and coding standards. Provide detailed feedback, including suggestions for improvement, 
-        potential bugs, and adherence to coding standards.\n\n
-        ### Repository Context\n
-        {repository_context}\n\n
-        ### Coding Standards and Guidelines\n
-        {formatted_directives}\n\n
-        ### Pull Request Diff\n
-        {diff_details}\n\n
-        ### Instructions\n
-        1. Identify performance issues, potential bugs, and inconsistencies.\n
-        2. Suggest improvements to code quality and adherence to coding standards.\n
-        3. Provide specific code suggestions where applicable.\n
-        4. Focus on SQL query optimization if relevant.\n\n
-        The output MUST be in this json format where each comment is an element of the array:\n
-    """, """
-        {
-            comments: [
-                {
-                    file_path: ,
-                    start_line_number: 1,
-                    end_line_number: 10,
-                    content: Comment content,
-                }
-            ]
-        }
-        \n
-        Where each comment is directed at a portion of the diff identified by the start_line_number and end_line_number. Calculate the appropriate start_line_number and end_line_number to highlight only the part of the diff that is relevant to the comment.\n
-        IMPORTANT: make sure that the start_line_number and end_line_number values must be part of the same hunk as the line\n\n
-        IMPORTANT: DO NOT include any other text, only the json format.\n
-
-        Begin your review below:\n
-
-    """])
-
-    return prompt
+    formatted_directives = "\n\n".join(load_directive_content(directive) for directive in directives)
+
+    # The prefix is identical for every PR of a repo (same directives, same
+    # repository context); only the diff onwards varies.
+    prefix = (
+        _PROMPT_PREFIX,
+        repository_context,
+        "\n\n### Coding Standards and Guidelines\n",
+        formatted_directives,
+        "\n\n### Pull Request Diff\n",
+    )
+    suffix = (
+        _compact_diff(diff_details),
+        _PROMPT_SUFFIX,
+    )
+
+    if as_blocks:
+        return [
+            {"type": "text", "text": "".join(prefix),
+             "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": "".join(suffix)},
+        ]
+    return "".join(prefix + suffix)
@@ -2,35 +2,160 @@ import os
 import sys
 import json
 import re  # Add this import for escaping special characters
-from github_auth import authenticate_github
-from github_pr import fetch_pull_request_details, fetch_pull_request_diff, post_inline_comments
-from config_validator import load_config, validate_config
-from prompt_generator import generate_review_prompt
-from diff_analyzer import analyze_diff
-from llm_wrapper import LLMWrapper
-from logger import setup_logger
+import difflib
+import hashlib
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from core.logger import setup_logger
+
+# The heavier core modules (and their requests/yaml dependency stacks) are
+# imported inside main() once the environment checks pass, so a run that
+# exits early over a missing variable never pays their import cost.
 
 # Initialize logger
 logger = setup_logger()
 
+# Resolved once at import; repeated runs and future call sites share the
+# same normalized absolute path instead of re-joining ".." segments.
+CONFIG_PATH = pathlib.Path(__file__).resolve().parent.parent / "config" / "config.yaml"
+
+# Per-PR review state (last reviewed head SHA and diff) lives here so
+# iterative pushes can be reviewed incrementally instead of resending the
+# whole diff to the LLM.
+_STATE_DIR = ".github-reviewer-cache"
+
+# Shape the LLM response must match; passed to backends supporting
+# structured outputs so the comments document parses without relying on the
+# model honoring the prompt's format instructions.
+_REVIEW_RESPONSE_SCHEMA = {
+    "type": "object",
+    "required": ["comments"],
+    "properties": {
+        "comments": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["file_path", "start_line_number", "end_line_number", "content"],
+                "properties": {
+                    "file_path": {"type": "string"},
+                    "start_line_number": {"type": "integer"},
+                    "end_line_number": {"type": "integer"},
+                    "content": {"type": "string"},
+                },
+            },
+        },
+    },
+}
+
+# Disk tier of the LLM response cache, shared across invocations. Keyed by
+# an exact digest of the prompt and query parameters: re-runs over an
+# unchanged diff (retriggered workflows, repeated pushes that resolve to
+# the same incremental diff) skip the backend round-trip entirely.
+def _llm_cache_path(prompt_digest):
+    return os.path.join(_STATE_DIR, "llm-cache", f"{prompt_digest}.json")
+
+def _load_cached_llm_response(prompt_digest):
+    """Return a previously saved LLM response, or None if absent/unreadable."""
+    try:
+        with open(_llm_cache_path(prompt_digest), "r") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+def _save_cached_llm_response(prompt_digest, llm_response):
+    """Persist an LLM response; best-effort, never fails the review."""
+    path = _llm_cache_path(prompt_digest)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as cache_file:
+            json.dump(llm_response, cache_file)
+    except (OSError, TypeError) as e:
+        logger.warning(f"Could not cache LLM response: {e}")
+
+# Escape patterns for comment bodies, compiled once instead of per comment.
+_ESCAPE_QUOTES = re.compile(r'(["\\])')
+_ESCAPE_CONTROL = re.compile(r'[\b\f\n\r\t]')
+
+def _review_state_path(repo_name, pr_number):
+    return os.path.join(_STATE_DIR, repo_name, f"{pr_number}.json")
+
+def _load_review_state(repo_name, pr_number):
+    """Return the saved state for a PR, or None if absent or unreadable."""
+    try:
+        with open(_review_state_path(repo_name, pr_number), "r") as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return None
+
+def _save_review_state(repo_name, pr_number, head_sha, diff_details):
+    """Persist the reviewed head SHA and diff for the next invocation."""
+    path = _review_state_path(repo_name, pr_number)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as state_file:
+            json.dump({
+                "head_sha": head_sha,
+                "diff_sha256": hashlib.sha256(diff_details.encode()).hexdigest(),
+                "prior_diff": diff_details,
+            }, state_file)
+    except OSError as e:
+        # State is an optimization; never fail the review over it.
+        logger.warning(f"Could not save review state for PR #{pr_number}: {e}")
+
+def _incremental_diff(prior_diff, diff_details, threshold=0.2):
+    """
+    Return only the parts of the new diff that were not in the previously
+    reviewed diff, each under its enclosing `+++` file header so comments
+    can still be attributed to a path, or None when the overlap is too
+    small for an incremental review to make sense (more than `threshold`
+    of the diff changed).
+    """
+    old_lines = prior_diff.splitlines()
+    new_lines = diff_details.splitlines()
+    if not new_lines:
+        return None
+    # SequenceMatcher opcodes give the exact set of new-diff lines absent
+    # from the prior diff, without the `+`-prefix ambiguity of parsing
+    # unified_diff output (where a real `+++ b/path` line becomes `++++`).
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    new_indices = set()
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag in ("insert", "replace"):
+            new_indices.update(range(j1, j2))
+    if not new_indices or len(new_indices) / len(new_lines) >= threshold:
+        return None
+    # Walk the new diff in order, re-attaching the current file header
+    # above each retained run so no hunk reaches the prompt pathless.
+    parts = []
+    current_header = None
+    emitted_header = None
+    for index, line in enumerate(new_lines):
+        if line.startswith("+++ "):
+            current_header = line
+            if index in new_indices:
+                parts.append(line)
+                emitted_header = line
+            continue
+        if index in new_indices:
+            if current_header is not None and emitted_header != current_header:
+                parts.append(current_header)
+                emitted_header = current_header
+            parts.append(line)
+    if not parts:
+        return None
+    return "\n".join(parts)
+
 def main():
     """
     Main entry point for the review agent.
     """
     try:
-        # Load and validate configuration
-        config_path = os.path.join(os.path.dirname(__file__), "../config/config.yaml")
-        config = load_config(config_path)
-        validate_config(config)
-
-        # Authenticate with GitHub
+        # Validate the environment before anything else so a misconfigured
+        # run fails immediately, without importing the network stacks.
         github_token = os.getenv("GITHUB_TOKEN")
         if not github_token:
             logger.error("GITHUB_TOKEN environment variable is not set.")
             sys.exit(1)
-        session = authenticate_github(github_token)
-
-        # Extract pull request details from environment variables
         repo_name = os.getenv("GITHUB_REPOSITORY")
         pr_number = os.getenv("GITHUB_PR_NUMBER")
         if not repo_name or not pr_number:
@@ -38,22 +163,71 @@ def main():
             sys.exit(1)
         pr_number = int(pr_number)
 
-        # Fetch pull request details and diff
-        pr_details = fetch_pull_request_details(session, repo_name, pr_number)
-        diff_details = fetch_pull_request_diff(session, repo_name, pr_number)
+        from core.config_validator import load_validated_config
+        from core.github_auth import authenticate_github
+        from core.github_pr import (fetch_pull_request_details, fetch_pull_request_diff,
+                                    fetch_latest_commit_id, post_inline_comments)
+        from core.prompt_generator import generate_review_prompt
+        from core.diff_analyzer import analyze_diff_parallel
+        from core.llm_wrapper import LLMWrapper
 
-        # Analyze the diff
-        analyzed_segments = analyze_diff(diff_details)
+        # Load and validate configuration
+        config = load_validated_config(str(CONFIG_PATH))
 
-        # Generate review prompt
+        # Authenticate with GitHub
+        session = authenticate_github(github_token)
+
+        # Fetch pull request details and diff concurrently — they are
+        # independent network calls, so wall time becomes the slower of the
+        # two instead of their sum.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            details_future = executor.submit(fetch_pull_request_details, session, repo_name, pr_number)
+            diff_future = executor.submit(fetch_pull_request_diff, session, repo_name, pr_number)
+            pr_details = details_future.result()
+            # The diff is streamed as lines; join once here because the
+            # review prompt needs the full text as well.
+            diff_details = "\n".join(diff_future.result())
+
+        # Analyze the diff, fanning out across processes on many-file PRs.
+        analyzed_segments = analyze_diff_parallel(diff_details)
+
+        # When the PR was reviewed before and the new diff mostly overlaps
+        # the prior one (small follow-up push), send only the incremental
+        # part to the LLM — token count then scales with the push, not the
+        # whole PR.
+        prompt_diff = diff_details
         repository_context = "Repository context is not yet implemented."  # Placeholder
+        state = _load_review_state(repo_name, pr_number)
+        if state and state.get("prior_diff"):
+            incremental = _incremental_diff(state["prior_diff"], diff_details)
+            if incremental:
+                logger.info("Diff largely overlaps the previous review; "
+                            "reviewing incrementally.")
+                prompt_diff = incremental
+                repository_context += (
+                    "\nNOTE: This pull request was already reviewed at commit "
+                    f"{state.get('head_sha', 'unknown')}; only the new or "
+                    "changed parts of the diff follow.")
+
+        # Generate review prompt
         directives = config["directives"]
-        prompt = generate_review_prompt(repository_context, diff_details, directives)
+        prompt = generate_review_prompt(repository_context, prompt_diff, directives)
         print(f"Generated prompt: {prompt}")
 
         # Query the LLM
-        llm_wrapper = LLMWrapper(config["llm_backends"], retry_attempts=3, retry_delay=2)
-        llm_response = llm_wrapper.query(prompt, max_tokens=config["llm_parameters"]["max_tokens"])
+        # Reuse the authenticated session's connection pool for the LLM
+        # calls instead of opening a second pool.
+        llm_wrapper = LLMWrapper(config["llm_backends"], session=session)
+        max_tokens = config["llm_parameters"]["max_tokens"]
+        prompt_digest = hashlib.sha256(
+            f"{prompt}|{max_tokens}|{_REVIEW_RESPONSE_SCHEMA}".encode()).hexdigest()
+        llm_response = _load_cached_llm_response(prompt_digest)
+        if llm_response is None:
+            llm_response = llm_wrapper.query(prompt, max_tokens=max_tokens,
+                                             response_schema=_REVIEW_RESPONSE_SCHEMA)
+            _save_cached_llm_response(prompt_digest, llm_response)
+        else:
+            logger.info("Reusing cached LLM response for an identical prompt.")
 
         print(f"LLM response: {llm_response}")
         
@@ -69,15 +243,23 @@ def main():
         comments = llm_response_json.get("comments", [])
         for comment in comments:
             if "content" in comment:
-                comment["content"] = re.sub(r'(["\\])', r'\\\1', comment["content"])  # Escape quotes and backslashes
-                comment["content"] = re.sub(r'[\b\f\n\r\t]', lambda m: repr(m.group(0))[1:-1], comment["content"])  # Escape special characters
+                comment["content"] = _ESCAPE_QUOTES.sub(r'\\\1', comment["content"])  # Escape quotes and backslashes
+                comment["content"] = _ESCAPE_CONTROL.sub(lambda m: repr(m.group(0))[1:-1], comment["content"])  # Escape special characters
 
         if not comments:
             logger.warning("No comments generated by the LLM.")
+            _save_review_state(repo_name, pr_number,
+                               fetch_latest_commit_id(session, repo_name, pr_number),
+                               diff_details)
             sys.exit(0)
         # # Post inline comments
         post_inline_comments(session, repo_name, pr_number, comments)
 
+        # Remember what was reviewed so the next push can be incremental.
+        _save_review_state(repo_name, pr_number,
+                           fetch_latest_commit_id(session, repo_name, pr_number),
+                           diff_details)
+
         logger.info("Pull request review completed sucessfully.")
 
     except Exception as e: